@@ -3,6 +3,7 @@ from poblacion import Poblacion
 from problem import Problem
 from grammar import Grammar
 from parser import parse_bnf
+from fitness_store import FitnessStore
 
 SECTION = 'Parametros'
 
@@ -24,77 +25,52 @@ ADJUSTMENT_WEIGHT_PARAMETER = 'peso_ajuste'
 SATISFACTION_WEIGHT_PARAMETER = 'peso_satisfaccion'
 BNF_FILENAME_PARAMETER = 'bnf_filename'
 BNF_META_FILENAME_PARAMETER = 'bnf_meta_filename'
+FITNESS_STORE_PARAMETER = 'fitness_store'
+SURROGATE_FRACTION_PARAMETER = 'surrogate_fraction'
+SURROGATE_SAMPLE_PARAMETER = 'surrogate_sample'
+SURROGATE_AUDIT_PARAMETER = 'surrogate_audit'
 META_SUFFIX = '_meta'
 
-def config_to_population(config):
+PROBLEM_PARAMETERS = [EQUATION_PARAMETER, FITNESS_FAIL_PARAMETER, LIMINF_PARAMETER,
+                      LIMSUP_PARAMETER, STEP_PARAMETER, ADJUSTMENT_WEIGHT_PARAMETER,
+                      SATISFACTION_WEIGHT_PARAMETER]
+
+def config_to_problem(config, section=SECTION):
     # Default values
-    n = 50
-    l = 20
-    ml = 50
-    pc = 0.8
-    pm = 0.05
-    tm = 'simple'
-    bg = 0.1
-    elit = True
-    cm = 'homologous'
     equation = '_y_ - x'
+    ff = 1e4
     li = 0.0
     ls = 5.0
     step = 0.1
     pa = 1.0
     ps = 1.0
 
-    # Poblacion parameters
-    if config.has_option(SECTION, SIZE_PARAMETER):
-        n = config.getint(SECTION, SIZE_PARAMETER)
-    if config.has_option(SECTION, LENGTH_PARAMETER):
-        l = config.getint(SECTION, LENGTH_PARAMETER)
-    if config.has_option(SECTION, MAX_LENGTH_PARAMETER):
-        ml = config.getint(SECTION, MAX_LENGTH_PARAMETER)
-    if config.has_option(SECTION, CROSSOVER_RATE_PARAMETER):
-        pc = config.getfloat(SECTION, CROSSOVER_RATE_PARAMETER)
-    if config.has_option(SECTION, MUTATION_RATE_PARAMETER):
-        pm = config.getfloat(SECTION, MUTATION_RATE_PARAMETER)
-    if config.has_option(SECTION, MUTATION_TYPE_PARAMETER):
-        tm = config.get(SECTION, MUTATION_TYPE_PARAMETER)
-    if config.has_option(SECTION, GENERATION_GAP_PARAMETER):
-        bg = config.getfloat(SECTION, GENERATION_GAP_PARAMETER)
-    if config.has_option(SECTION, ELITISM_PARAMETER):
-        elit = config.getboolean(SECTION, ELITISM_PARAMETER)
-    if config.has_option(SECTION, CROSSOVER_METHOD_PARAMETER):
-        cm = config.get(SECTION, CROSSOVER_METHOD_PARAMETER)
+    if config.has_option(section, EQUATION_PARAMETER):
+        equation = config.get(section, EQUATION_PARAMETER)
+    if config.has_option(section, FITNESS_FAIL_PARAMETER):
+        ff = config.getfloat(section, FITNESS_FAIL_PARAMETER)
+    if config.has_option(section, LIMINF_PARAMETER):
+        li = config.getfloat(section, LIMINF_PARAMETER)
+    if config.has_option(section, LIMSUP_PARAMETER):
+        ls = config.getfloat(section, LIMSUP_PARAMETER)
+    if config.has_option(section, STEP_PARAMETER):
+        step = config.getfloat(section, STEP_PARAMETER)
+    if config.has_option(section, ADJUSTMENT_WEIGHT_PARAMETER):
+        pa = config.getfloat(section, ADJUSTMENT_WEIGHT_PARAMETER)
+    if config.has_option(section, SATISFACTION_WEIGHT_PARAMETER):
+        ps = config.getfloat(section, SATISFACTION_WEIGHT_PARAMETER)
+    return Problem(equation, ff, li, ls, step, pa, ps)
 
-    # Problem parameters
-    if config.has_option(SECTION, EQUATION_PARAMETER):
-        equation = config.get(SECTION, EQUATION_PARAMETER)
-    if config.has_option(SECTION, FITNESS_FAIL_PARAMETER):
-        ff = config.getfloat(SECTION, FITNESS_FAIL_PARAMETER)
-    if config.has_option(SECTION, LIMINF_PARAMETER):
-        li = config.getfloat(SECTION, LIMINF_PARAMETER)
-    if config.has_option(SECTION, LIMSUP_PARAMETER):
-        ls = config.getfloat(SECTION, LIMSUP_PARAMETER)
-    if config.has_option(SECTION, STEP_PARAMETER):
-        step = config.getfloat(SECTION, STEP_PARAMETER)
-    if config.has_option(SECTION, ADJUSTMENT_WEIGHT_PARAMETER):
-        pa = config.getfloat(SECTION, ADJUSTMENT_WEIGHT_PARAMETER)
-    if config.has_option(SECTION, SATISFACTION_WEIGHT_PARAMETER):
-        ps = config.getfloat(SECTION, SATISFACTION_WEIGHT_PARAMETER)
-    problem = Problem(equation, ff, li, ls, step, pa, ps)
-    
-    # Grammar parameters
-    if config.has_option(SECTION, BNF_FILENAME_PARAMETER):
-        bnf_filename = config.get(SECTION, BNF_FILENAME_PARAMETER)
+def config_to_bnf_filenames(config, section=SECTION):
+    if config.has_option(section, BNF_FILENAME_PARAMETER):
+        bnf_filename = config.get(section, BNF_FILENAME_PARAMETER)
     else:
         raise Exception, "%s parameter is required" % BNF_FILENAME_PARAMETER
     if not os.path.isfile(bnf_filename):
         raise Exception, "%s doesn't exist" % bnf_filename
 
-    bnf = ''.join(open(bnf_filename, 'r').readlines())
-    grammar = Grammar(parse_bnf(bnf))
-
-    # Meta grammar parameters
-    if config.has_option(SECTION, BNF_META_FILENAME_PARAMETER):
-        bnf_meta_filename = config.get(SECTION, BNF_META_FILENAME_PARAMETER)
+    if config.has_option(section, BNF_META_FILENAME_PARAMETER):
+        bnf_meta_filename = config.get(section, BNF_META_FILENAME_PARAMETER)
         if not os.path.isfile(bnf_meta_filename):
             raise Exception, "%s doesn't exist" % bnf_meta_filename
     else:
@@ -103,9 +79,91 @@ def config_to_population(config):
         if not os.path.isfile(bnf_meta_filename):
             raise Exception, "%s parameter is required" % BNF_META_FILENAME_PARAMETER
 
+    return bnf_filename, bnf_meta_filename
+
+def bnf_files_to_grammar(bnf_filename, bnf_meta_filename):
+    bnf = ''.join(open(bnf_filename, 'r').readlines())
+    grammar = Grammar(parse_bnf(bnf))
+
     bnf_meta = ''.join(open(bnf_meta_filename, 'r').readlines())
     dict_meta = parse_bnf(bnf_meta)
     dict_meta = dict((k,v[0]) for (k,v) in dict_meta.items())
+    return grammar, dict_meta
+
+def config_to_population(config, section=SECTION, cache=None, seed=None):
+    """ Construye la Poblacion descripta en la seccion section de config.
+        Si se pasa un diccionario cache, la gramatica, el problema y el
+        fitness store se reutilizan entre llamadas con los mismos valores
+        en lugar de volver a construirse.
+    """
+    if cache is None:
+        cache = {}
+
+    # Default values
+    n = 50
+    l = 20
+    ml = 50
+    pc = 0.8
+    pm = 0.05
+    tm = 'simple'
+    bg = 0.1
+    elit = True
+    cm = 'homologous'
+    sf = None
+    sm = 10
+    sa = 0.1
+
+    # Poblacion parameters
+    if config.has_option(section, SIZE_PARAMETER):
+        n = config.getint(section, SIZE_PARAMETER)
+    if config.has_option(section, LENGTH_PARAMETER):
+        l = config.getint(section, LENGTH_PARAMETER)
+    if config.has_option(section, MAX_LENGTH_PARAMETER):
+        ml = config.getint(section, MAX_LENGTH_PARAMETER)
+    if config.has_option(section, CROSSOVER_RATE_PARAMETER):
+        pc = config.getfloat(section, CROSSOVER_RATE_PARAMETER)
+    if config.has_option(section, MUTATION_RATE_PARAMETER):
+        pm = config.getfloat(section, MUTATION_RATE_PARAMETER)
+    if config.has_option(section, MUTATION_TYPE_PARAMETER):
+        tm = config.get(section, MUTATION_TYPE_PARAMETER)
+    if config.has_option(section, GENERATION_GAP_PARAMETER):
+        bg = config.getfloat(section, GENERATION_GAP_PARAMETER)
+    if config.has_option(section, ELITISM_PARAMETER):
+        elit = config.getboolean(section, ELITISM_PARAMETER)
+    if config.has_option(section, CROSSOVER_METHOD_PARAMETER):
+        cm = config.get(section, CROSSOVER_METHOD_PARAMETER)
+    if config.has_option(section, SURROGATE_FRACTION_PARAMETER):
+        sf = config.getfloat(section, SURROGATE_FRACTION_PARAMETER)
+        if not 0.0 <= sf <= 1.0:
+            raise Exception, "%s must be between 0 and 1" % SURROGATE_FRACTION_PARAMETER
+    if config.has_option(section, SURROGATE_SAMPLE_PARAMETER):
+        sm = config.getint(section, SURROGATE_SAMPLE_PARAMETER)
+    if config.has_option(section, SURROGATE_AUDIT_PARAMETER):
+        sa = config.getfloat(section, SURROGATE_AUDIT_PARAMETER)
+        if not 0.0 <= sa <= 1.0:
+            raise Exception, "%s must be between 0 and 1" % SURROGATE_AUDIT_PARAMETER
+
+    # Problem parameters
+    problem_key = ('problem',) + tuple(config.get(section, p) if config.has_option(section, p) else None
+                                       for p in PROBLEM_PARAMETERS)
+    if problem_key not in cache:
+        cache[problem_key] = config_to_problem(config, section)
+    problem = cache[problem_key]
+
+    # Grammar and meta grammar parameters
+    grammar_key = ('grammar',) + config_to_bnf_filenames(config, section)
+    if grammar_key not in cache:
+        cache[grammar_key] = bnf_files_to_grammar(*grammar_key[1:])
+    grammar, dict_meta = cache[grammar_key]
+
+    # Fitness store parameters
+    store = None
+    if config.has_option(section, FITNESS_STORE_PARAMETER):
+        store_key = ('store', config.get(section, FITNESS_STORE_PARAMETER))
+        if store_key not in cache:
+            cache[store_key] = FitnessStore(store_key[1])
+        store = cache[store_key]
 
-    popul = Poblacion(n, l, problem, grammar, dict_meta, ml, pc, pm, tm, bg, elit, cm)
+    popul = Poblacion(n, l, problem, grammar, dict_meta, ml, pc, pm, tm, bg, elit, cm, store,
+                      seed, sf, sm, sa)
     return popul
@@ -3,6 +3,7 @@ from random import randint, choice
 from problem import Problem
 from grammar import Grammar
 from copy import deepcopy
+from simplify import simplify_program
 
 START_SYMBOL = "<S>"
 VARIABLE_FORMAT = '(\<[^\>|^\s]+\>)'
@@ -11,12 +12,16 @@ RIGHT_DEL = '>'
 
 class Crom:
     def __init__ (self, length, max_length, problem, grammar, dict_meta,
-                  genes=None, cross_meth=None):
+                  genes=None, cross_meth=None, store=None):
         self._length = length
         self._max_length = max_length
         self._problem = problem
         self._grammar = grammar
         self._dict_meta = dict_meta
+        self._store = store
+        self._fitness = None
+        # Lo marca Poblacion a los hijos generados por la cruza
+        self._offspring = False
 
         if genes is None:
             self._genes = []
@@ -73,14 +78,55 @@ class Crom:
         self._valid = complete
         self._length = len(self._genes)
 
+        # Lo que se evalua es el programa simplificado; _program queda
+        # igual para reportar
+        if self._valid:
+            self._simplified_program, self._node_count, self._simplified_node_count = \
+                simplify_program(self._program)
+        else:
+            self._simplified_program = self._program
+            self._node_count = self._simplified_node_count = 0
+
 ####
 
     def eval_fitness(self):
-        if self._valid:
-            fitness = self._problem.eval_fitness(self._program)
-        else:
-            fitness = self._problem.get_fitness_fail()
+        if self._fitness is None:
+            self._fitness = self._eval_fitness()
+        return self._fitness
 
+    def estimate_fitness(self, sample):
+        """ Fitness aproximado, evaluando solo sample puntos de la grilla.
+        """
+        if self._fitness is not None:
+            return self._fitness
+        if not self._valid:
+            return self._problem.get_fitness_fail()
+        if sample >= self._problem.get_grid_size():
+            # La muestra cubre toda la grilla: es el fitness real
+            return self.eval_fitness()
+        return self._problem.eval_fitness(self._simplified_program, sample)
+
+    def lookup_fitness(self):
+        """ Busca el fitness en el fitness store sin evaluar el programa.
+            Devuelve None si no esta.
+        """
+        if self._fitness is None and self._valid and self._store is not None:
+            key = self._store.key(self._problem, self._program)
+            self._fitness = self._store.get(key)
+        return self._fitness
+
+    def _eval_fitness(self):
+        if not self._valid:
+            return self._problem.get_fitness_fail()
+
+        if self._store is None:
+            return self._problem.eval_fitness(self._simplified_program)
+
+        key = self._store.key(self._problem, self._program)
+        fitness = self._store.get(key)
+        if fitness is None:
+            fitness = self._problem.eval_fitness(self._simplified_program)
+            self._store.put(key, fitness)
         return fitness
 
 ####
@@ -0,0 +1,105 @@
+import hashlib
+import sqlite3
+import sys
+import time
+
+TABLE_NAME = 'fitness'
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_TIMEOUT = 60.0
+SETUP_RETRIES = 10
+SETUP_RETRY_DELAY = 0.5
+
+class FitnessStore:
+    """ Almacen persistente de fitness, compartido entre corridas.
+
+        Las claves son un hash de la firma del problema (ecuacion
+        normalizada, limites, step, pesos, fitness_fail) y del programa,
+        de modo que distintas corridas sobre el mismo problema reutilizan
+        los resultados sin importar el resto de los parametros.
+        Las escrituras se acumulan y se guardan por lotes. La base es un
+        archivo sqlite en modo WAL, asi que varias corridas en la misma
+        maquina pueden usarla a la vez. Como es solo un cache, los
+        errores de sqlite no cortan la corrida: una lectura fallida es un
+        fallo de cache y las escrituras fallidas se reintentan en el
+        siguiente flush.
+    """
+    def __init__(self, filename, batch_size=DEFAULT_BATCH_SIZE,
+                 timeout=DEFAULT_TIMEOUT):
+        self._filename = filename
+        self._batch_size = batch_size
+        self._pending = {}
+        self._conn = None
+        for i in xrange(SETUP_RETRIES):
+            try:
+                self._conn = self._connect(timeout)
+                break
+            except sqlite3.OperationalError, e:
+                time.sleep(SETUP_RETRY_DELAY)
+        if self._conn is None:
+            sys.stderr.write("fitness store %s unavailable (%s), running without it\n"
+                             % (filename, e))
+
+    def _connect(self, timeout):
+        conn = sqlite3.connect(self._filename, timeout=timeout)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS %s '
+                         '(key TEXT PRIMARY KEY, fitness REAL)' % TABLE_NAME)
+            conn.commit()
+        except sqlite3.OperationalError:
+            conn.close()
+            raise
+        return conn
+
+    def key(self, problem, program):
+        signature = problem.get_signature() + '\n' + program
+        return hashlib.sha1(signature.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """ Devuelve el fitness guardado para key, o None si no esta.
+        """
+        if key in self._pending:
+            return self._pending[key]
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute('SELECT fitness FROM %s WHERE key = ?' % TABLE_NAME,
+                                     (key,)).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        if row is None:
+            return None
+        # sqlite guarda NaN como NULL
+        return row[0] if row[0] is not None else float('nan')
+
+    def put(self, key, fitness):
+        self._pending[key] = fitness
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending or self._conn is None:
+            return
+        try:
+            self._conn.executemany('INSERT OR REPLACE INTO %s (key, fitness) VALUES (?, ?)'
+                                   % TABLE_NAME, self._pending.items())
+            self._conn.commit()
+        except sqlite3.OperationalError:
+            # Se quedan en _pending para el proximo flush
+            self._conn.rollback()
+            return
+        self._pending = {}
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+
+    def __len__(self):
+        self.flush()
+        if self._conn is None:
+            return len(self._pending)
+        return self._conn.execute('SELECT COUNT(*) FROM %s' % TABLE_NAME).fetchone()[0]
+
+    def __str__(self):
+        return self._filename
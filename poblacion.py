@@ -2,6 +2,7 @@ import sys
 import random as random_module
 import math
 import pylab
+from scipy.stats import spearmanr
 from random import randint, random, choice
 from copy import copy
 from pprint import pprint
@@ -19,8 +20,9 @@ class Pair:
 
 class Poblacion:
     def __init__(self, n, l, problem, grammar, dict_meta, 
-                 ml=None, pc=0.8, pm=0.05, tm='simple', bg=0.1, elit=True, cm="homologous"):
-        random_module.seed()
+                 ml=None, pc=0.8, pm=0.05, tm='simple', bg=0.1, elit=True, cm="homologous",
+                 store=None, seed=None, sf=None, sm=10, sa=0.1):
+        random_module.seed(seed)
         
         self._n = n
         self._l = l
@@ -38,23 +40,85 @@ class Poblacion:
         self._brecha_gen = bg
         self._elitismo = elit
         self._crossover_method = cm
+        self._store = store
+        self._surrogate_fraction = sf
+        self._surrogate_sample = sm
+        self._surrogate_audit = sa
+        self._surrogate_correlations = []
         
         self._individuos = []
         self._next_generation = []
         for i in xrange(n):
             self._individuos.append(Crom(self._l, self._max_length, self._problem, 
                                          self._grammar, self._dict_meta,
-                                         cross_meth = self._crossover_method))
+                                         cross_meth = self._crossover_method,
+                                         store = self._store))
 
 
 ####
 
     def _compute_fitness_list(self, individuos):
+        screened = {}
+        if self._surrogate_fraction is not None:
+            screened = self._prescreen(individuos)
+
         fitness_list = []
         for i, indiv in enumerate(individuos):
-            fitness_list.append(Pair(i, indiv.eval_fitness()))
+            if id(indiv) in screened:
+                fitness_list.append(Pair(i, screened[id(indiv)]))
+            else:
+                fitness_list.append(Pair(i, indiv.eval_fitness()))
+        if self._store is not None:
+            self._store.flush()
         return fitness_list
 
+####
+
+    def _prescreen(self, individuos):
+        """ Estima el fitness de los hijos que todavia no tienen fitness
+            real (ni en memoria ni en el fitness store) usando solo
+            surrogate_sample puntos de la grilla, y evalua completamente
+            solo la fraccion surrogate_fraction con mejor estimacion, mas
+            una fraccion surrogate_audit elegida al azar entre los
+            descartados. Al resto se le asigna su estimacion, pero nunca
+            mejor que el peor fitness real, de modo que quedan al final del
+            ranking. Devuelve ese fitness asignado, indexado por id del
+            individuo, y registra la correlacion de rangos entre estimacion
+            y fitness real de todos los que se evaluaron.
+        """
+        candidates = []
+        seen = set()
+        for indiv in individuos:
+            if not indiv._offspring or not indiv._valid or id(indiv) in seen:
+                continue
+            seen.add(id(indiv))
+            if indiv.lookup_fitness() is None:
+                candidates.append(indiv)
+        if not candidates:
+            self._surrogate_correlations.append(None)
+            return {}
+
+        estimates = sorted(((indiv.estimate_fitness(self._surrogate_sample), indiv)
+                            for indiv in candidates), key=lambda e: e[0])
+        n_eval = int(math.ceil(len(estimates) * self._surrogate_fraction))
+        screened_out = estimates[n_eval:]
+        n_audit = int(math.ceil(len(screened_out) * self._surrogate_audit))
+        audited = random_module.sample(screened_out, n_audit)
+        evaluated = estimates[:n_eval] + audited
+        predicted = [e for e, indiv in evaluated]
+        real = [indiv.eval_fitness() for e, indiv in evaluated]
+
+        if len(real) > 1:
+            self._surrogate_correlations.append(spearmanr(predicted, real)[0])
+        else:
+            self._surrogate_correlations.append(None)
+
+        fitnesses = [indiv._fitness for indiv in individuos
+                     if indiv._valid and indiv._fitness is not None]
+        worst = max(fitnesses) if fitnesses else self._problem.get_fitness_fail()
+        return dict((id(indiv), max(e, worst)) for e, indiv in screened_out
+                    if indiv._fitness is None)
+
 ####
 
     def get_best_fitness(self):
@@ -65,6 +129,17 @@ class Poblacion:
     def get_best_index(self):
         return min(self._fitness_list).indice
 
+####
+
+    def get_mean_surrogate_correlation(self):
+        """ Promedio de la correlacion de rangos del surrogate en las
+            generaciones en que se pudo calcular, o None si en ninguna.
+        """
+        correlations = [c for c in self._surrogate_correlations if c is not None and c == c]
+        if not correlations:
+            return None
+        return sum(correlations) / len(correlations)
+
 ####
 
     def get_best_member(self):
@@ -73,32 +148,45 @@ class Poblacion:
 
 ####
 
-    def ev_and_print(self, maxit, tol):
-        
+    def ev_and_print(self, maxit, tol, verbose=True):
+        """ Evoluciona hasta maxit generaciones o hasta que el mejor
+            fitness sea menor o igual a tol. Devuelve la cantidad de
+            generaciones hasta la convergencia, o None si no la hubo.
+        """
         self._medians = []
         self._bests = []
+        self._node_reductions = []
+        self._surrogate_correlations = []
         i = 0
         while i < maxit:
             self._fitness_list = sorted(self._compute_fitness_list(self._individuos))
             mejor_fitness = self.get_best_fitness()
             self._medians.append(self._get_median())
             self._bests.append(mejor_fitness)
-            print "Generacion", i
-            print "mejor fitness:", mejor_fitness, \
-                  "fitness mediana:", self._fitness_list[self._n/2].fitness,\
-                  "invalidos:", sum(1 for indiv in self._individuos if not indiv._valid),\
-                  "promedio longitud", self._average_length()
-            print "Mejor individuo:"
-            print self.get_best_member()
+            self._node_reductions.append(self._average_node_reduction())
+            if verbose:
+                print "Generacion", i
+                print "mejor fitness:", mejor_fitness, \
+                      "fitness mediana:", self._fitness_list[self._n/2].fitness,\
+                      "invalidos:", sum(1 for indiv in self._individuos if not indiv._valid),\
+                      "promedio longitud", self._average_length(),\
+                      "reduccion promedio de nodos", self._node_reductions[-1]
+                if self._surrogate_fraction is not None:
+                    print "correlacion de rangos del surrogate:", self._surrogate_correlations[-1]
+                print "Mejor individuo:"
+                print self.get_best_member()
             if mejor_fitness <= tol:
                 break
             self.evolucionar()
             i += 1
 
         if i == maxit:
-            print "No hubo convergencia"
-        else:
+            if verbose:
+                print "No hubo convergencia"
+            return None
+        if verbose:
             print "Convergencia en %i generaciones" % i
+        return i
 
 ####
 
@@ -159,6 +247,11 @@ class Poblacion:
 
         child1 = self._create_crom(genes_child1)
         child2 = self._create_crom(genes_child2)
+        # Un hijo identico a un padre hereda su fitness
+        for child in (child1, child2):
+            for parent in (parent_a, parent_b):
+                if child._genes == parent._genes and parent._fitness is not None:
+                    child._fitness = parent._fitness
         self._next_generation.append(child1)
         self._next_generation.append(child2)
         
@@ -181,9 +274,12 @@ class Poblacion:
 ####
 
     def _create_crom(self, genes_crom):
-        return Crom(0, self._max_length, self._problem, 
+        crom = Crom(0, self._max_length, self._problem, 
                     self._grammar, self._dict_meta,
-                    cross_meth = self._crossover_method, genes=genes_crom)
+                    cross_meth = self._crossover_method, genes=genes_crom,
+                    store = self._store)
+        crom._offspring = True
+        return crom
 
 ####
 
@@ -209,5 +305,10 @@ class Poblacion:
         return median
     def _average_length(self):
         return sum(i.length() for i in self._individuos) / float(len(self._individuos))
+    def _average_node_reduction(self):
+        valids = [i for i in self._individuos if i._valid]
+        if not valids:
+            return 0.0
+        return sum(i._node_count - i._simplified_node_count for i in valids) / float(len(valids))
     def __getitem__(self, index):
         return self._individuos[index]
@@ -7,6 +7,7 @@ import math, scipy, re, sys
 FORMA_ECUACION = "(_y.*?_)"
 SEP_EC = "&"
 ARG_COND = ".*\((.*)\).*"
+GRID_TOLERANCE = 1e-9
 
 class Problem:
     def __init__(self, ec, ff=1e4, li=0, ls=5, step=0.1, pa=1.0, ps=1.0):
@@ -22,6 +23,13 @@ class Problem:
         self._step = step
         self._peso_ajuste = pa
         self._peso_satisfaccion = ps
+        # La grilla es x_k = li + k*step, con k = 0 .. n_puntos-1. La
+        # tolerancia es relativa porque el error de redondeo de q crece con q.
+        q = (ls - li) / float(step)
+        k = round(q)
+        if abs(q - k) > GRID_TOLERANCE * max(1.0, abs(q)):
+            k = math.floor(q)
+        self._n_puntos = max(0, int(k) + 1)
 
     def _generar_ecuacion(self):
         ecuacion = "abs("
@@ -41,6 +49,7 @@ class Problem:
                 ecuacion += parte
         ecuacion += ")"
         self._ecuacion = ecuacion 
+        self._codigo_ecuacion = compile(ecuacion, '<ecuacion>', 'eval')
 
     def _generar_condiciones(self):
         condiciones = []
@@ -64,25 +73,54 @@ class Problem:
             condicion += ")"
             condiciones.append(condicion)
         self._condiciones = deepcopy(condiciones)
+        self._codigo_condiciones = [compile(cond, '<condicion>', 'eval')
+                                    for cond in condiciones]
 
 
-    def eval_fitness(self, program):
-        x = self._lim_inf
-        ajuste = 0.0
-        f = lambda x: eval(program)
+    def _punto(self, k):
+        return self._lim_inf + k * self._step
 
-        while x <= self._lim_sup:
-            try:
-                fitness = eval(self._ecuacion)
-            except:
-                return self._fitness_fail
+    def _ajuste(self, f, indices):
+        """ Maximo de la ecuacion sobre los puntos de la grilla con los
+            indices dados.
+        """
+        codigo = self._codigo_ecuacion
+        ajuste = 0.0
+        for k in indices:
+            x = self._punto(k)
+            fitness = eval(codigo)
             ajuste = max(ajuste, fitness)
-            x += self._step
+        return ajuste
+
+    def _indices(self, muestra=None):
+        if muestra is not None and muestra < self._n_puntos:
+            # Puntos equiespaciados de la grilla, incluyendo los extremos
+            if muestra <= 1:
+                return [0]
+            ultimo = self._n_puntos - 1
+            return [int(round(j * ultimo / (muestra - 1.0))) for j in xrange(muestra)]
+        return xrange(self._n_puntos)
+
+    def eval_fitness(self, program, muestra=None):
+        """ Si se pasa muestra, el ajuste se calcula solo sobre esa
+            cantidad de puntos de la grilla. Es una estimacion barata
+            y optimista del fitness real.
+        """
+        try:
+            codigo = compile(program.strip(), '<programa>', 'eval')
+        except:
+            return self._fitness_fail
+        f = lambda x: eval(codigo)
+
+        try:
+            ajuste = self._ajuste(f, self._indices(muestra))
+        except:
+            return self._fitness_fail
         
         satisfaccion = 0.0
         mult_satisfaccion = 1.0 # XXX
         #mult_satisfaccion = round((self._lim_sup - self._lim_inf) / self._step)
-        for condicion in self._condiciones:
+        for condicion in self._codigo_condiciones:
             try:
                 fitness = eval(condicion)
             except:
@@ -96,24 +134,28 @@ class Problem:
     def get_fitness_fail(self):
         return self._fitness_fail
 
+    def get_grid_size(self):
+        return self._n_puntos
+
+    def get_signature(self):
+        """ Identifica todo lo que determina el fitness de un programa.
+            La ecuacion se normaliza quitando los espacios.
+        """
+        ecuacion = ''.join(self._arg_ec.split())
+        return '\n'.join([ecuacion] + [repr(float(v)) for v in
+                          (self._lim_inf, self._lim_sup, self._step,
+                           self._peso_ajuste, self._peso_satisfaccion,
+                           self._fitness_fail)])
+
     def plotear(self, program):
+        x = [self._punto(k) for k in xrange(self._n_puntos)]
         if (isinstance(program, str)):
             f = lambda x: eval(program)
-            x = []
-            i = self._lim_inf
-            while i <= self._lim_sup:
-                x.append(i)
-                i += self._step
             plot(x, [f(i) for i in x])
             show()
         elif (isinstance(program, list)):
             for prog in program:
                 f = lambda x: eval(prog)
-                x = []
-                i = self._lim_inf
-                while i <= self._lim_sup:
-                    x.append(i)
-                    i += self._step
                 plot(x, [f(i) for i in x])
             show()
 
@@ -0,0 +1,166 @@
+import ast
+import math
+import numbers
+
+FOLD_FILENAME = '<plegado>'
+FOLD_FUNCTIONS = ['abs', 'pow']
+FOLD_MODULE = 'math'
+FOLD_ENVIRONMENT = {FOLD_MODULE: math,
+                    '__builtins__': {'abs': abs, 'pow': pow}}
+# Los enteros mas grandes no se pliegan: calcularlos y escribirlos es mas
+# caro que dejarlos, y al evaluar suelen terminar en OverflowError
+FOLD_MAX_INT = 2**53
+
+def simplify_program(program):
+    """ Pliega las subexpresiones constantes de program y aplica
+        reescrituras algebraicas que no cambian su valor. Devuelve
+        el programa simplificado y la cantidad de nodos antes y despues.
+        Si program no se puede simplificar, se devuelve tal cual.
+    """
+    try:
+        tree = ast.parse(program.strip(), mode='eval')
+        nodes = count_nodes(tree)
+        tree = _Simplifier().visit(tree)
+        return to_source(tree.body), nodes, count_nodes(tree)
+    except Exception:
+        return program, 0, 0
+
+def count_nodes(tree):
+    return sum(1 for node in ast.walk(tree) if isinstance(node, ast.expr))
+
+####
+
+def _is_num(node, value=None):
+    if not isinstance(node, ast.Num):
+        return False
+    if value is None:
+        return True
+    # Solo se usan neutros enteros para no cambiar el tipo de la expresion
+    return type(node.n) == type(value) and node.n == value
+
+def _is_constant(node):
+    """ node es constante si sus hijos ya fueron plegados a numeros.
+    """
+    if isinstance(node, ast.UnaryOp):
+        return _is_num(node.operand)
+    if isinstance(node, ast.BinOp):
+        return _is_num(node.left) and _is_num(node.right)
+    if isinstance(node, ast.Attribute):
+        return isinstance(node.value, ast.Name) and node.value.id == FOLD_MODULE
+    if isinstance(node, ast.Call):
+        func = node.func
+        known = (isinstance(func, ast.Name) and func.id in FOLD_FUNCTIONS) or \
+                (isinstance(func, ast.Attribute) and _is_constant(func))
+        return known and not node.keywords and all(_is_num(a) for a in node.args)
+    return False
+
+def _is_big_power(node):
+    """ True si node es una potencia entera cuyo resultado excede FOLD_MAX_INT.
+    """
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+        base, exponent = node.left, node.right
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and \
+         node.func.id == 'pow' and len(node.args) == 2:
+        base, exponent = node.args
+    else:
+        return False
+    if not isinstance(base.n, numbers.Integral) or not isinstance(exponent.n, numbers.Integral):
+        return False
+    return abs(base.n) > 1 and exponent.n > 0 and \
+           exponent.n * math.log(abs(base.n), 2) > math.log(FOLD_MAX_INT, 2)
+
+def _fold(node):
+    """ Evalua node y lo reemplaza por su valor. Si la evaluacion falla
+        o da un entero mayor a FOLD_MAX_INT se deja node, para que el
+        programa se evalue como estaba.
+    """
+    if _is_big_power(node):
+        return node
+    try:
+        expression = ast.fix_missing_locations(ast.Expression(body=node))
+        value = eval(compile(expression, FOLD_FILENAME, 'eval'), FOLD_ENVIRONMENT)
+    except Exception:
+        return node
+    if not isinstance(value, numbers.Real) or isinstance(value, bool):
+        return node
+    if isinstance(value, float) and (math.isinf(value) or math.isnan(value)):
+        return node
+    if isinstance(value, numbers.Integral) and abs(value) > FOLD_MAX_INT:
+        return node
+    return ast.copy_location(ast.Num(n=value), node)
+
+class _Simplifier(ast.NodeTransformer):
+    def generic_visit(self, node):
+        node = ast.NodeTransformer.generic_visit(self, node)
+        if isinstance(node, ast.expr) and not isinstance(node, ast.Num) and _is_constant(node):
+            return _fold(node)
+        return node
+
+    def visit_UnaryOp(self, node):
+        node = self.generic_visit(node)
+        if not isinstance(node, ast.UnaryOp):
+            return node
+        # +e -> e
+        if isinstance(node.op, ast.UAdd):
+            return node.operand
+        # --e -> e
+        if isinstance(node.op, ast.USub) and isinstance(node.operand, ast.UnaryOp) and \
+           isinstance(node.operand.op, ast.USub):
+            return node.operand.operand
+        return node
+
+    def visit_BinOp(self, node):
+        node = self.generic_visit(node)
+        if not isinstance(node, ast.BinOp):
+            return node
+        op, left, right = node.op, node.left, node.right
+        # e+0, e-0, e*1, e/1, e**1 -> e
+        if (isinstance(op, (ast.Add, ast.Sub)) and _is_num(right, 0)) or \
+           (isinstance(op, (ast.Mult, ast.Div, ast.Pow)) and _is_num(right, 1)):
+            return left
+        # 0+e, 1*e -> e
+        if (isinstance(op, ast.Add) and _is_num(left, 0)) or \
+           (isinstance(op, ast.Mult) and _is_num(left, 1)):
+            return right
+        return node
+
+    def visit_Call(self, node):
+        node = self.generic_visit(node)
+        if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Name) or \
+           node.keywords or len(node.args) != (2 if node.func.id == 'pow' else 1):
+            return node
+        arg = node.args[0]
+        # pow(e, 1) -> e
+        if node.func.id == 'pow' and _is_num(node.args[1], 1):
+            return arg
+        # abs(abs(e)) -> abs(e)
+        if node.func.id == 'abs' and isinstance(arg, ast.Call) and \
+           isinstance(arg.func, ast.Name) and arg.func.id == 'abs':
+            return arg
+        return node
+
+####
+
+BINARY_OPERATORS = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/',
+                    ast.FloorDiv: '//', ast.Mod: '%', ast.Pow: '**'}
+UNARY_OPERATORS = {ast.UAdd: '+', ast.USub: '-'}
+
+def to_source(node):
+    """ Convierte una expresion de vuelta a codigo. Las operaciones se
+        parentizan siempre, asi no hace falta tener en cuenta precedencias.
+    """
+    if isinstance(node, ast.Num):
+        source = repr(node.n)
+        return '(%s)' % source if source.startswith('-') else source
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return '%s.%s' % (to_source(node.value), node.attr)
+    if isinstance(node, ast.BinOp):
+        return '(%s %s %s)' % (to_source(node.left), BINARY_OPERATORS[type(node.op)],
+                               to_source(node.right))
+    if isinstance(node, ast.UnaryOp):
+        return '(%s%s)' % (UNARY_OPERATORS[type(node.op)], to_source(node.operand))
+    if isinstance(node, ast.Call) and not node.keywords:
+        return '%s(%s)' % (to_source(node.func), ', '.join(to_source(a) for a in node.args))
+    raise ValueError, "unsupported expression: %s" % type(node).__name__
@@ -0,0 +1,121 @@
+#!/usr/bin/python
+
+import ConfigParser
+import getopt, itertools, os, sys, time
+from multiprocessing import Pool, cpu_count
+from config import config_to_population, SECTION
+
+SWEEP_SECTION = 'Barrido'
+SWEEP_SEPARATOR = '|'
+DEFAULT_PARAMS_FILENAME = 'parameters.cfg'
+DEFAULT_RESULTS_FILENAME = 'barrido.tsv'
+DEFAULT_MAXIT = 50
+DEFAULT_TOL = 0.01
+RESULTS_HEADER = ['corrida', 'archivo', 'seccion', 'parametros', 'semilla',
+                  'mejor_fitness', 'generaciones', 'tiempo', 'correlacion_surrogate']
+
+# Gramaticas, problemas y fitness stores ya construidos por este proceso
+_cache = {}
+
+def sweep_runs(filenames, repetitions, base_seed):
+    """ Genera las corridas a realizar. Cada seccion de cada archivo cuyo
+        nombre empiece con SECTION es una configuracion base; si el archivo
+        tiene una seccion SWEEP_SECTION, cada una de sus opciones es una
+        lista de valores separados por SWEEP_SEPARATOR (que no aparece en
+        las ecuaciones, a diferencia de la coma) y la configuracion base
+        se repite para cada combinacion de esos valores.
+    """
+    runs = []
+    for filename in filenames:
+        config = ConfigParser.RawConfigParser()
+        if config.read(filename) == []:
+            raise Exception, "Invalid filename: %s" % filename
+
+        grid = []
+        if config.has_section(SWEEP_SECTION):
+            grid = [(option, [v.strip() for v in values.split(SWEEP_SEPARATOR)])
+                    for option, values in config.items(SWEEP_SECTION)]
+        names = [option for option, values in grid]
+
+        for section in config.sections():
+            if not section.startswith(SECTION):
+                continue
+            base = dict(config.items(section))
+            for values in itertools.product(*[v for o, v in grid]):
+                options = dict(base)
+                options.update(zip(names, values))
+                params = ';'.join('%s=%s' % nv for nv in zip(names, values))
+                for r in xrange(repetitions):
+                    runs.append((len(runs), filename, section, params, options,
+                                 base_seed + len(runs)))
+    return runs
+
+def run(args):
+    run_id, filename, section, params, options, seed, maxit, tol = args
+    config = ConfigParser.RawConfigParser()
+    config.add_section(SECTION)
+    for option, value in options.items():
+        config.set(SECTION, option, value)
+
+    start = time.time()
+    poblacion = config_to_population(config, cache=_cache, seed=seed)
+    generations = poblacion.ev_and_print(maxit, tol, verbose=False)
+    wall_time = time.time() - start
+    correlation = poblacion.get_mean_surrogate_correlation()
+
+    return (run_id, filename, section, params, seed, min(poblacion._bests),
+            '-' if generations is None else generations, wall_time,
+            '-' if correlation is None else correlation)
+
+if __name__=='__main__':
+    opts, args = getopt.getopt(sys.argv[1:], "f:j:r:s:o:g:t:")
+
+    filenames = []
+    processes = cpu_count()
+    repetitions = 1
+    base_seed = int(time.time())
+    results_filename = DEFAULT_RESULTS_FILENAME
+    maxit = DEFAULT_MAXIT
+    tol = DEFAULT_TOL
+    for o, a in opts:
+        if o == "-f":
+            filenames.append(a)
+        if o == "-j":
+            processes = int(a)
+        if o == "-r":
+            repetitions = int(a)
+        if o == "-s":
+            base_seed = int(a)
+        if o == "-o":
+            results_filename = a
+        if o == "-g":
+            maxit = int(a)
+        if o == "-t":
+            tol = float(a)
+
+    if not filenames:
+        filenames = [DEFAULT_PARAMS_FILENAME]
+    for filename in filenames:
+        if not os.path.isfile(filename):
+            print("Invalid filename: %s" % filename)
+            sys.exit(1)
+
+    runs = [r + (maxit, tol) for r in sweep_runs(filenames, repetitions, base_seed)]
+    print "%i corridas en %i procesos" % (len(runs), processes)
+
+    pool = Pool(processes)
+    results = []
+    for result in pool.imap_unordered(run, runs):
+        results.append(result)
+        print "Corrida %i/%i: mejor fitness %s, generaciones %s, tiempo %.2fs" % \
+              (len(results), len(runs), result[5], result[6], result[7])
+    pool.close()
+    pool.join()
+
+    results.sort()
+    out = open(results_filename, 'w')
+    out.write('\t'.join(RESULTS_HEADER) + '\n')
+    for result in results:
+        out.write('\t'.join(str(v) for v in result) + '\n')
+    out.close()
+    print "Resultados en %s" % results_filename